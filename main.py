@@ -6,48 +6,59 @@ import re
 import sys
 import urllib.request
 import urllib.parse
+import shutil
+import json
+import hashlib
+import hmac
+import secrets
+import tempfile
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from multiprocessing import Pool
 from functools import partial
 
-# Verificar argumentos de línea de comandos
-if len(sys.argv) < 3:
-    print("❌ Debes proporcionar la ruta del directorio raíz y el video_id como argumentos.")
-    print("Uso: python3 main.py /ruta/del/directorio VIDEO_ID [INTRO_FILENAME_OPCIONAL] [BACKGROUND_FILENAME_OPCIONAL] [BORDER_FILENAME_OPCIONAL]")
-    sys.exit(1)
-
-root_dir = sys.argv[1]
-video_id = sys.argv[2]
-intro_url = None
-if len(sys.argv) > 3:
-    intro_filename = sys.argv[3]
-    intro_url = f"https://sleepai.online/storage/intros/{intro_filename}"
-
-# Video de fondo (parámetro opcional)
-video_fondo_path = "/home/private/loop.mp4"  # Valor por defecto
-background_url = None
-if len(sys.argv) > 4:
-    background_filename = sys.argv[4]
-    background_url = f"https://sleepai.online/storage/backgrounds/{background_filename}"
-
-# Border (parámetro opcional)
-border_path = "/home/private/border.png"  # Valor por defecto
-border_url = None
-if len(sys.argv) > 5:
-    border_filename = sys.argv[5]
-    border_url = f"https://sleepai.online/storage/frames/{border_filename}"
-
-# Verificar que existan los archivos necesarios
-if not os.path.exists(video_fondo_path):
-    print(f"❌ No se encontró el video de fondo en: {video_fondo_path}")
-    sys.exit(1)
-
-if not os.path.exists(border_path):
-    print(f"❌ No se encontró el border en: {border_path}")
-    sys.exit(1)
-
-if not os.path.exists(root_dir):
-    print(f"❌ No existe el directorio raíz: {root_dir}")
-    sys.exit(1)
+# Parámetros de render de los segmentos
+SEGMENT_WIDTH = 1920
+SEGMENT_HEIGHT = 1080
+SEGMENT_FPS = 25
+SEGMENT_PRESET = 'ultrafast'
+SEGMENT_GOP_FRAMES = 250  # keyint de libx264 (10 s a 25 fps)
+MAX_PARALLEL_SEGMENTS = 4  # Ajustar según tu CPU
+SEGMENT_CHUNK_SECONDS = 10 * 60  # Las secciones más largas se parten en trozos de ~10 min
+PROFILE_SAMPLE_SECONDS = 30  # Duración de la muestra que se perfila con --profile
+
+# Título de cada sección: se rasteriza una vez en un PNG transparente y se superpone como imagen
+TITLE_STYLE = {
+    'font': 'Sans', 'fontcolor': 'white', 'fontsize': 60,
+    'shadowcolor': 'black', 'shadowx': 3, 'shadowy': 3,
+    'borderw': 2, 'bordercolor': 'white',
+}
+TITLE_Y = 70
+TITLE_LINE_HEIGHT = 1.5  # Alto de cada línea del título, en múltiplos de fontsize
+TITLE_PLATE_DIR = os.path.join(tempfile.gettempdir(), "sleepai_title_plates")
+
+# Modos de escritura de render/render.mp4 (--output-mode=...)
+#   default: moov al final, el archivo sólo es utilizable cuando termina el mux
+#   fragmented: MP4 fragmentado, se puede ir subiendo mientras se escribe
+#   faststart: moov al principio en una sola pasada (espacio reservado con -moov_size)
+FINAL_OUTPUT_MODES = ('default', 'fragmented', 'faststart')
+
+# Control de admisión: memoria y disco que se dejan siempre libres
+MEMORY_RESERVE_BYTES = 512 * 1024 * 1024
+DISK_RESERVE_BYTES = 2 * 1024 * 1024 * 1024
+ADMISSION_TIMEOUT = 30 * 60  # Segundos máximos esperando recursos
+
+# Render distribuido: tiempo extra que se concede a un worker sobre la duración del segmento
+SEGMENT_LEASE_MARGIN = 10 * 60
+WORKER_POLL_INTERVAL = 2  # Segundos entre peticiones de un worker sin tareas
+WORKER_CONNECT_TIMEOUT = 60  # Segundos que un worker reintenta si no hay coordinador
+SEGMENT_MAX_ATTEMPTS = 3  # Intentos por segmento antes de dar el trabajo por fallido
+COORDINATOR_IDLE_TIMEOUT = 10 * 60  # Segundos sin workers trabajando antes de abandonar
+
+# Recursos por defecto y origen de los recursos personalizados
+DEFAULT_BACKGROUND_PATH = "/home/private/loop.mp4"
+DEFAULT_BORDER_PATH = "/home/private/border.png"
+STORAGE_BASE_URL = "https://sleepai.online/storage"
 
 def download_intro_video(url, output_dir):
     """Descarga el video intro desde la URL proporcionada"""
@@ -163,8 +174,20 @@ def download_border_image(url, output_dir):
         print(f"❌ Error descargando border: {e}")
         return None
 
-def get_video_duration(file_path):
-    """Obtiene la duración de un archivo de video en segundos usando ffprobe"""
+# Duraciones ya consultadas con ffprobe, compartidas por todos los trabajos del proceso
+_duration_cache = {}
+
+def probe_duration(file_path):
+    """Obtiene la duración de un archivo multimedia con ffprobe, usando la caché si no ha cambiado"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return 0
+
+    cache_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+    if cache_key in _duration_cache:
+        return _duration_cache[cache_key]
+
     try:
         result = subprocess.run([
             'ffprobe', '-i', file_path,
@@ -174,12 +197,19 @@ def get_video_duration(file_path):
         ], capture_output=True, text=True)
 
         if result.returncode == 0:
-            return float(result.stdout.strip())
+            duration = float(result.stdout.strip())
         else:
             return 0
     except:
         return 0
 
+    _duration_cache[cache_key] = duration
+    return duration
+
+def get_video_duration(file_path):
+    """Obtiene la duración de un archivo de video en segundos usando ffprobe"""
+    return probe_duration(file_path)
+
 def format_time(seconds):
     """Convierte segundos a formato HH:MM:SS"""
     hours = int(seconds // 3600)
@@ -189,21 +219,167 @@ def format_time(seconds):
 
 def get_mp3_duration(file_path):
     """Obtiene la duración de un archivo MP3 en segundos usando ffprobe"""
+    return probe_duration(file_path)
+
+# Frames de lookahead de libx264 según el preset (rc-lookahead por defecto)
+X264_PRESET_LOOKAHEAD = {
+    'ultrafast': 0, 'superfast': 0, 'veryfast': 10, 'faster': 20,
+    'fast': 30, 'medium': 40, 'slow': 50, 'slower': 60, 'veryslow': 60,
+}
+
+# Bits por píxel aproximados que produce libx264 (CRF por defecto) según el preset
+X264_PRESET_BITS_PER_PIXEL = {
+    'ultrafast': 0.16, 'superfast': 0.12, 'veryfast': 0.09, 'faster': 0.08,
+    'fast': 0.08, 'medium': 0.07, 'slow': 0.07, 'slower': 0.065, 'veryslow': 0.06,
+}
+
+def estimate_ffmpeg_footprint(width, height, preset, duration, fps=SEGMENT_FPS):
+    """Estima la memoria (bytes) y el disco (bytes) que necesita un ffmpeg con libx264"""
+    frame_bytes = width * height * 3 // 2  # yuv420p
+    threads = max(1, int((os.cpu_count() or 1) * 1.5))  # -threads 0 en libx264
+
+    # Frames vivos: lookahead + referencias + un frame por hilo + buffers del decoder/filtros
+    frames_in_flight = X264_PRESET_LOOKAHEAD.get(preset, 40) + 16 + threads + 16
+    # Los filtros (scale/overlay con RGBA) y el proceso base de ffmpeg añaden un extra fijo
+    memory = 150 * 1024 * 1024 + frames_in_flight * frame_bytes * 2
+
+    bits_per_pixel = X264_PRESET_BITS_PER_PIXEL.get(preset, 0.07)
+    disk = int(width * height * fps * bits_per_pixel * duration / 8)
+
+    return memory, disk
+
+def get_available_memory():
+    """Obtiene la memoria disponible del sistema en bytes"""
     try:
-        result = subprocess.run([
-            'ffprobe', '-i', file_path,
-            '-show_entries', 'format=duration',
-            '-v', 'quiet',
-            '-of', 'csv=p=0'
-        ], capture_output=True, text=True)
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
 
-        if result.returncode == 0:
-            return float(result.stdout.strip())
-        else:
-            return 0
-    except:
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+def get_free_disk(path):
+    """Obtiene el espacio libre en disco (bytes) del sistema de archivos de path"""
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
         return 0
 
+class ResourceBudget:
+    """Presupuesto de memoria y disco compartido por todos los trabajos y ffmpeg de este proceso
+
+    Cada trabajo reserva al entrar la memoria de un encoder y el disco de todos sus intermedios, y
+    los devuelve al terminar. Con esa reserva sus segmentos pueden correr siempre de uno en uno;
+    para renderizar más a la vez piden memoria extra al presupuesto común.
+    """
+
+    def __init__(self, memory_reserve=MEMORY_RESERVE_BYTES, disk_reserve=DISK_RESERVE_BYTES):
+        self.memory_reserve = memory_reserve
+        self.disk_reserve = disk_reserve
+        # Fotos de la memoria y el disco libres cuando no hay nada reservado: lo que escriben
+        # los trabajos en marcha ya está descontado de sus reservas, no se cuenta dos veces
+        self.memory_budget = 0
+        self.disk_budgets = {}  # dispositivo -> disco libre al entrar el primer trabajo
+        self.memory_in_use = 0
+        self.disk_in_use = {}  # dispositivo -> disco reservado por los trabajos en marcha
+        self.jobs = 0
+        self.condition = threading.Condition()
+
+    def _refresh_snapshots(self, device, output_dir):
+        # Llamar con el lock tomado
+        if self.jobs == 0:
+            self.memory_budget = max(0, get_available_memory() - self.memory_reserve)
+        if not self.disk_in_use.get(device):
+            self.disk_budgets[device] = max(0, get_free_disk(output_dir) - self.disk_reserve)
+
+    def admit_job(self, output_dir, memory, disk, timeout=ADMISSION_TIMEOUT):
+        """Espera a que quepa un trabajo y le reserva un encoder y su disco
+
+        Devuelve el ticket del trabajo, o None si no hubo sitio antes del timeout. Sin otros
+        trabajos en marcha la memoria no bloquea: mejor en serie que no empezar.
+        """
+        device = os.stat(output_dir).st_dev
+        deadline = time.time() + timeout
+        waiting = False
+        with self.condition:
+            while True:
+                self._refresh_snapshots(device, output_dir)
+                fits_memory = self.jobs == 0 or self.memory_in_use + memory <= self.memory_budget
+                disk_free = self.disk_budgets[device] - self.disk_in_use.get(device, 0)
+                if fits_memory and disk <= disk_free:
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    if not fits_memory:
+                        print(f"❌ Memoria insuficiente para el trabajo: necesita {memory // 2**20} MB "
+                              f"({self.jobs} trabajos en marcha)")
+                    else:
+                        print(f"❌ Disco insuficiente para el trabajo: necesita {disk // 2**20} MB "
+                              f"({max(0, disk_free) // 2**20} MB libres)")
+                    return None
+                if not waiting:
+                    print(f"⏳ Trabajo en espera de {'memoria' if not fits_memory else 'disco libre'}...")
+                    waiting = True
+                # Sin nada en marcha nadie avisará: se vuelve a mirar el disco cada pocos segundos
+                self.condition.wait(min(remaining, 5))
+
+            self.memory_in_use += memory
+            self.disk_in_use[device] = self.disk_in_use.get(device, 0) + disk
+            self.jobs += 1
+            return {'memory': memory, 'disk': disk, 'device': device, 'slot_free': True}
+
+    def finish_job(self, ticket):
+        """Devuelve la memoria y el disco reservados por un trabajo terminado"""
+        with self.condition:
+            self.memory_in_use -= ticket['memory']
+            self.disk_in_use[ticket['device']] -= ticket['disk']
+            self.jobs -= 1
+            self.condition.notify_all()
+
+    def acquire(self, ticket, memory, label):
+        """Espera hasta que haya memoria para un render del trabajo
+
+        Devuelve la memoria cargada al presupuesto común, o 0 si usa el encoder reservado por el
+        trabajo. No hay timeout: ese encoder queda libre en cuanto termina el render anterior.
+        """
+        waiting = False
+        with self.condition:
+            while True:
+                if ticket['slot_free']:
+                    ticket['slot_free'] = False
+                    return 0
+                if self.memory_in_use + memory <= self.memory_budget:
+                    self.memory_in_use += memory
+                    return memory
+
+                if not waiting:
+                    print(f"⏳ {label} en espera de memoria")
+                    waiting = True
+                self.condition.wait()
+
+    def release(self, ticket, charged):
+        """Devuelve la memoria de un render terminado (lo que devolvió acquire)"""
+        with self.condition:
+            if charged:
+                self.memory_in_use -= charged
+            else:
+                ticket['slot_free'] = True
+            self.condition.notify_all()
+
+RESOURCE_BUDGET = ResourceBudget()
+
+def estimate_job_footprint(total_duration):
+    """Memoria de un encoder de segmentos y disco de todos los intermedios de un trabajo"""
+    memory, segment_disk = estimate_ffmpeg_footprint(SEGMENT_WIDTH, SEGMENT_HEIGHT, SEGMENT_PRESET, total_duration)
+    # Segmentos + video concatenado + render final, más el audio a 128k
+    return memory, segment_disk * 3 + int(128000 * total_duration / 8)
+
 def monitor_simple_progress(progress_file, total_duration, operation_name, start_time):
     """Monitorea el progreso y muestra porcentajes que suben gradualmente"""
     last_printed_progress = 0
@@ -312,9 +488,9 @@ def monitor_progress(progress_file, total_duration, operation_name):
 
         time.sleep(0.5)
 
-def concatenate_audio():
+def concatenate_audio(job):
     """Concatena todos los audios usando ffmpeg con progreso y optimizaciones"""
-    parent_dir = os.path.dirname(root_dir)
+    parent_dir = os.path.dirname(job['root_dir'])
     progress_file = os.path.join(parent_dir, "progress_concat.txt")
     audios_file = os.path.join(parent_dir, "audios.txt")
     output_file = os.path.join(parent_dir, "concat_audio.mp3")
@@ -359,12 +535,8 @@ def concatenate_audio():
         print(f"Error ejecutando ffmpeg: {e}")
         return False
 
-def create_single_segment(segment_data):
-    """Crea un segmento individual de video - función para paralelizar"""
-    i, folder_name, duration = segment_data
-    assets_path = root_dir
-    folder_path = os.path.join(assets_path, folder_name)
-
+def read_segment_assets(folder_path):
+    """Busca la imagen y lee el título (sin escapar) de la carpeta de una sección"""
     # Buscar la imagen en la carpeta
     image_file = None
     for file_name in os.listdir(folder_path):
@@ -384,38 +556,207 @@ def create_single_segment(segment_data):
             with open(title_file, 'r', encoding='latin-1') as f:
                 title = f.read().strip()
 
-        # Escapar caracteres para ffmpeg drawtext
-        # Reemplazar comillas simples y dobles
-        title = title.replace("'", "'\\\\\\''").replace('"', '\\"')
-        # Envolver el título en comillas simples para ffmpeg
-        title = f"'{title}'"
+    return image_file, title
+
+def escape_filter_value(value):
+    """Escapa un valor de opción para usarlo dentro de un filtergraph de ffmpeg"""
+    # Primer nivel: opciones del filtro (separadas por ':')
+    for char in "\\':":
+        value = value.replace(char, '\\' + char)
+    # Segundo nivel: el propio filtergraph
+    escaped = ''
+    for char in value:
+        escaped += '\\' + char if char in "\\'[],;" else char
+    return escaped
+
+def title_drawtext_filter(text_file):
+    """Filtro drawtext del título, leyendo el texto de un archivo para no tener que escaparlo"""
+    style = ':'.join(f'{key}={value}' for key, value in TITLE_STYLE.items())
+    return f'drawtext=textfile={escape_filter_value(text_file)}:expansion=none:x=(w-text_w)/2:y={TITLE_Y}:{style}'
+
+def get_title_plate_height(title):
+    """Alto del lienzo en el que se dibuja el título: lo bastante para todas sus líneas"""
+    lines = title.count('\n') + 1
+    height = TITLE_Y + lines * int(TITLE_STYLE['fontsize'] * TITLE_LINE_HEIGHT)
+    height += 2 * TITLE_STYLE['borderw'] + TITLE_STYLE['shadowy'] + 20
+    return min(SEGMENT_HEIGHT, height + height % 2)
+
+def detect_plate_bounds(plate_path):
+    """Caja (x, y, w, h) de los píxeles no transparentes de un PNG, en coordenadas pares
+
+    cropdetect sobre el canal alfa da los bordes exactos; x/y se bajan y w/h se suben a pares
+    para que el overlay sobre yuv420p no recorte el antialiasing de los bordes.
+    """
+    result = subprocess.run([
+        'ffmpeg', '-loop', '1', '-i', plate_path,
+        '-vf', 'alphaextract,cropdetect=limit=0:round=1:reset=0',
+        '-frames:v', '5',  # cropdetect se salta los primeros frames
+        '-f', 'null', '-'
+    ], capture_output=True, text=True)
+
+    bounds = re.findall(r'x1:(\d+) x2:(\d+) y1:(\d+) y2:(\d+)', result.stderr)
+    if result.returncode != 0 or not bounds:
+        return None
 
-    if not image_file:
+    x1, x2, y1, y2 = (int(v) for v in bounds[-1])
+    if x2 < x1 or y2 < y1:
+        return None  # Nada dibujado
+
+    x, y = x1 - x1 % 2, y1 - y1 % 2
+    w, h = x2 + 1 - x, y2 + 1 - y
+    return x, y, w + w % 2, h + h % 2
+
+def get_title_plate(title, cache_dir=TITLE_PLATE_DIR):
+    """Devuelve (ruta, x, y) del PNG transparente con el título ya rasterizado
+
+    La placa se recorta a la caja del texto (con borde y sombra), así cada frame sólo mezcla
+    esa zona, igual que drawtext. Se guarda por hash de texto, fuente y estilo, junto a un JSON
+    con su posición, así que los trozos de una misma sección (y los trabajos siguientes del
+    mismo proceso o máquina) reutilizan la misma.
+    """
+    if not title:
         return None
 
-    parent_dir = os.path.dirname(root_dir)
-    segment_output = os.path.join(parent_dir, f"segment_{i:02d}.mp4")
+    plate_key = json.dumps([title, TITLE_STYLE, TITLE_Y, TITLE_LINE_HEIGHT, SEGMENT_WIDTH], sort_keys=True)
+    plate_base = os.path.join(cache_dir, f"title_{hashlib.sha1(plate_key.encode('utf-8')).hexdigest()}")
+    plate_path = plate_base + '.png'
+    position_path = plate_base + '.json'
+    if os.path.exists(position_path) and os.path.exists(plate_path):
+        with open(position_path, 'r', encoding='utf-8') as f:
+            position = json.load(f)
+        return plate_path, position['x'], position['y']
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Nombres temporales por proceso: varios segmentos pueden pedir la misma placa a la vez
+    text_file = f"{plate_base}.{os.getpid()}.txt"
+    canvas_path = f"{plate_base}.{os.getpid()}.canvas.png"
+    partial_path = f"{plate_base}.{os.getpid()}.png"
+    partial_position = f"{plate_base}.{os.getpid()}.json"
+
+    try:
+        with open(text_file, 'w', encoding='utf-8') as f:
+            f.write(title)
+
+        # Paso 1: dibujar el título en un lienzo transparente del ancho del frame
+        result = subprocess.run([
+            'ffmpeg',
+            '-f', 'lavfi', '-i', f'color=c=black@0.0:s={SEGMENT_WIDTH}x{get_title_plate_height(title)},format=rgba',
+            '-vf', title_drawtext_filter(text_file),
+            '-frames:v', '1',
+            '-y', canvas_path
+        ], capture_output=True, text=True)
+
+        if result.returncode != 0:
+            print(f"Error creando la placa del título: {result.stderr[-500:]}")
+            return None
+
+        # Paso 2: recortar a la caja del texto; si no se detecta, se usa el lienzo entero
+        bounds = detect_plate_bounds(canvas_path)
+        if bounds:
+            x, y, w, h = bounds
+            result = subprocess.run([
+                'ffmpeg', '-i', canvas_path,
+                '-vf', f'crop={w}:{h}:{x}:{y}',
+                '-frames:v', '1',
+                '-y', partial_path
+            ], capture_output=True, text=True)
+
+            if result.returncode != 0:
+                print(f"Error recortando la placa del título: {result.stderr[-500:]}")
+                return None
+        else:
+            x, y = 0, 0
+            os.replace(canvas_path, partial_path)
+
+        with open(partial_position, 'w', encoding='utf-8') as f:
+            json.dump({'x': x, 'y': y}, f)
+
+        # La posición se publica la última: su existencia marca la placa como completa
+        os.replace(partial_path, plate_path)
+        os.replace(partial_position, position_path)
+        return plate_path, x, y
+
+    except Exception as e:
+        print(f"Error creando la placa del título: {e}")
+        return None
 
+    finally:
+        for temp_file in (text_file, canvas_path, partial_path, partial_position):
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+# Etapas acumulativas del filter graph de un segmento, para poder medirlas por separado
+SEGMENT_FILTER_STAGES = ('decode', 'scale', 'overlay', 'title')
+
+def build_segment_filter(stage='title', title_position=None, title_text_file=None):
+    """Construye el filter_complex de un segmento hasta la etapa indicada
+
+    La etapa 'drawtext' (título rasterizado en cada frame) sólo se usa para comparar
+    con la placa en el perfilado.
+    """
+    if stage == 'decode':
+        return '[0:v]null'
+    if stage == 'scale':
+        return f'[0:v]scale={SEGMENT_WIDTH}:{SEGMENT_HEIGHT}'
+
+    graph = (
+        f'[0:v]scale={SEGMENT_WIDTH}:{SEGMENT_HEIGHT}[bg];'
+        f'[1:v]scale=iw*0.97:ih*0.97[img];'
+        f'[2:v]scale=iw*0.97:ih*0.97[border];'
+        f'[bg][img]overlay=(W-w)/2:(H-h)/2[temp];'
+        f'[temp][border]overlay=(W-w)/2:(H-h)/2'
+    )
+    if stage == 'drawtext':
+        return graph + ',' + title_drawtext_filter(title_text_file)
+    if stage == 'title' and title_position:
+        # La placa está recortada al texto: sólo se mezcla su caja, en la misma posición que drawtext
+        x, y = title_position
+        return graph + f'[framed];[framed][3:v]overlay={x}:{y}'
+    return graph
+
+def segment_input_args(image_file, background_path, frame_path, title_plate=None, background_offset=0):
+    """Entradas de ffmpeg de un segmento: loop de fondo, imagen, border y placa del título"""
+    args = []
+    if background_offset:
+        # Los trozos de una sección arrancan el fondo donde lo dejó el anterior; los loops
+        # siguientes vuelven al principio del archivo, no al punto de -ss
+        args += ['-ss', f'{background_offset:.6f}']
+    args += [
+        '-stream_loop', '-1', '-i', background_path,        # Loop con framerate original
+        '-loop', '1', '-r', '1', '-i', image_file,           # Imagen estática a 1 FPS
+        '-loop', '1', '-r', '1', '-i', frame_path,           # Border estático a 1 FPS
+    ]
+    if title_plate:
+        args += ['-loop', '1', '-r', '1', '-i', title_plate]  # Título estático a 1 FPS
+    return args
+
+def segment_encode_args():
+    """Parámetros de codificación comunes a todos los segmentos"""
+    return [
+        '-c:v', 'libx264', '-preset', SEGMENT_PRESET,
+        '-g', str(SEGMENT_GOP_FRAMES),  # GOP fijo para que los trozos encajen al concatenar
+        '-pix_fmt', 'yuv420p',
+        '-r', str(SEGMENT_FPS),  # Framerate de salida
+    ]
+
+def render_segment(i, image_file, title, duration, background_path, frame_path, segment_output, background_offset=0):
+    """Renderiza con ffmpeg un segmento a partir de sus recursos ya en disco"""
     print(f"Creando segmento {i+1} con duración {format_time(duration)}...")
 
+    title_plate = get_title_plate(title)
+    if title and not title_plate:
+        return None
+    plate_path, title_position = (title_plate[0], title_plate[1:]) if title_plate else (None, None)
+
     try:
         # Comando optimizado - framerate normal para loop, 1 FPS para imágenes estáticas
         result = subprocess.run([
             'ffmpeg',
             '-threads', '0', '-filter_complex_threads', '0',  # Multihilo
-            '-stream_loop', '-1', '-i', video_fondo_path,       # Loop con framerate original
-            '-loop', '1', '-r', '1', '-i', image_file,           # Imagen estática a 1 FPS
-            '-loop', '1', '-r', '1', '-i', border_path,          # Border estático a 1 FPS
-            '-filter_complex',
-            f'[0:v]scale=1920:1080[bg];'
-            f'[1:v]scale=iw*0.97:ih*0.97[img];'
-            f'[2:v]scale=iw*0.97:ih*0.97[border];'
-            f'[bg][img]overlay=(W-w)/2:(H-h)/2[temp];'
-            f'[temp][border]overlay=(W-w)/2:(H-h)/2,drawtext=text={title}:fontcolor=white:fontsize=60:x=(w-text_w)/2:y=70:shadowcolor=black:shadowx=3:shadowy=3:borderw=2:bordercolor=white',
+            *segment_input_args(image_file, background_path, frame_path, plate_path, background_offset),
+            '-filter_complex', build_segment_filter('title', title_position),
             '-t', str(duration),
-            '-c:v', 'libx264', '-preset', 'ultrafast',  # Preset ultrafast
-            '-pix_fmt', 'yuv420p',
-            '-r', '25',  # Framerate de salida
+            *segment_encode_args(),
             '-y', segment_output
         ], capture_output=True, text=True)
 
@@ -430,42 +771,699 @@ def create_single_segment(segment_data):
         print(f"Error creando segmento {i+1}: {e}")
         return None
 
-def create_video_segments_parallel(folder_durations):
+def create_single_segment(segment_data):
+    """Crea un segmento individual de video - función para paralelizar"""
+    # Todas las rutas viajan con la tarea para no depender del estado del proceso padre
+    i, folder_path, duration, background_offset, background_path, frame_path, output_dir = segment_data
+
+    image_file, title = read_segment_assets(folder_path)
+
+    if not image_file:
+        return None
+
+    segment_output = os.path.join(output_dir, f"segment_{i:02d}.mp4")
+
+    return render_segment(i, image_file, title, duration, background_path, frame_path, segment_output, background_offset)
+
+def parse_ffmpeg_benchmark(stderr):
+    """Extrae de la salida de ffmpeg -benchmark/-benchmark_all/-stats los tiempos y estadísticas"""
+    report = {'codecs': {}}
+
+    # Resumen final de -benchmark
+    match = re.search(r'bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s', stderr)
+    if match:
+        report['utime'], report['stime'], report['rtime'] = (float(v) for v in match.groups())
+
+    match = re.search(r'bench: maxrss=(\d+)\s*[kK]i?B', stderr)
+    if match:
+        report['maxrss_kib'] = int(match.group(1))
+
+    # Líneas por frame de -benchmark_all: "bench: <user> user <sys> sys <real> real decode_video 0:0"
+    # (ffmpeg 7 usa "0:0" para decode y "0.0" para encode; las versiones anteriores, "0.0" siempre)
+    for user, system, real, name in re.findall(r'bench:\s*(\d+) user\s*(\d+) sys\s*(\d+) real (\S+(?: \d+[.:]\d+)?)', stderr):
+        if max(int(user), int(system), int(real)) >= 2**63:
+            continue  # Delta negativo que ffmpeg imprime como uint64: no es una medida
+        codec = report['codecs'].setdefault(name.replace(':', '.'), {'user': 0.0, 'sys': 0.0, 'real': 0.0, 'calls': 0})
+        codec['user'] += int(user) / 1000000
+        codec['sys'] += int(system) / 1000000
+        codec['real'] += int(real) / 1000000
+        codec['calls'] += 1
+
+    # Última línea de -stats (se reescribe con \r)
+    stats = re.findall(r'frame=\s*(\d+).*?fps=\s*([\d.]+).*?speed=\s*([\d.]+)x', stderr)
+    if stats:
+        frames, fps, speed = stats[-1]
+        report['frames'] = int(frames)
+        report['fps'] = float(fps)
+        report['speed'] = float(speed)
+
+    return report
+
+def profile_segment(i, image_file, title, duration, background_path, frame_path):
+    """Perfila una muestra de un segmento, etapa a etapa, con -benchmark y -benchmark_all
+
+    Cada etapa del filter graph se ejecuta de forma acumulativa hacia un muxer null, así el
+    coste de cada filtro es la diferencia de tiempo de CPU con la etapa anterior. Una última
+    pasada con libx264 da el coste de codificación. Si hay título, se mide también el drawtext
+    por frame para comparar antes/después con la placa pre-renderizada; si esa pasada falla,
+    title_benchmark queda en None y el resto del perfil se conserva.
+    """
+    sample = min(duration, PROFILE_SAMPLE_SECONDS)
+    print(f"⏱️ Perfilando {format_time(sample)} del segmento {i+1}...")
+
+    title_plate = get_title_plate(title)
+    has_plate = title_plate is not None
+    plate_path, title_position = (title_plate[0], title_plate[1:]) if has_plate else (None, None)
+    runs = [(stage, build_segment_filter(stage, title_position), ['-f', 'null']) for stage in SEGMENT_FILTER_STAGES]
+    runs.append(('encode', build_segment_filter('title', title_position), [*segment_encode_args(), '-f', 'null']))
+
+    title_text_file = None
+    if has_plate:
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', encoding='utf-8', delete=False) as f:
+            f.write(title)
+            title_text_file = f.name
+        runs.append(('drawtext', build_segment_filter('drawtext', title_text_file=title_text_file), ['-f', 'null']))
+
+    stages = {}
+    try:
+        for stage, graph, output_args in runs:
+            # La placa sólo se pasa como entrada cuando el graph la usa
+            plate_input = plate_path if '[3:v]' in graph else None
+            result = subprocess.run([
+                'ffmpeg', '-benchmark', '-benchmark_all', '-stats',
+                '-threads', '0', '-filter_complex_threads', '0',
+                *segment_input_args(image_file, background_path, frame_path, plate_input),
+                '-filter_complex', graph,
+                '-t', str(sample),
+                *output_args, '-'
+            ], capture_output=True, text=True)
+
+            if result.returncode != 0:
+                # La comparación con drawtext es opcional (ffmpeg sin freetype no lo tiene)
+                if stage == 'drawtext':
+                    print(f"⚠️ No se pudo medir drawtext, se omite la comparación: {result.stderr[-300:]}")
+                    continue
+                print(f"Error perfilando la etapa {stage}: {result.stderr[-500:]}")
+                return None
+            stages[stage] = parse_ffmpeg_benchmark(result.stderr)
+    finally:
+        if title_text_file and os.path.exists(title_text_file):
+            os.remove(title_text_file)
+
+    # Coste de cada filtro: tiempo de CPU extra respecto a la etapa anterior
+    filters = {}
+    previous = stages['decode']
+    for stage in SEGMENT_FILTER_STAGES[1:] + ('encode',):
+        current = stages[stage]
+        filters[stage] = {
+            key: round(current.get(key, 0) - previous.get(key, 0), 3)
+            for key in ('utime', 'stime', 'rtime')
+        }
+        previous = current
+
+    # Antes/después del título: drawtext por frame frente a la placa, ambos sobre la etapa overlay
+    title_benchmark = None
+    if 'drawtext' in stages:
+        title_benchmark = {
+            mode: round(stages[stage].get('utime', 0) - stages['overlay'].get('utime', 0), 3)
+            for mode, stage in (('drawtext', 'drawtext'), ('plate', 'title'))
+        }
+
+    return {
+        'segment': i,
+        'sample_seconds': sample,
+        'stages': stages,
+        'filters': filters,
+        'codecs': stages['encode']['codecs'],
+        'title_benchmark': title_benchmark,
+    }
+
+def write_profile_report(profile, output_dir):
+    """Guarda el perfil junto al render e imprime un resumen por filtro"""
+    report_path = os.path.join(output_dir, "profile.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+
+    print(f"⏱️ Perfil del segmento {profile['segment']+1} ({profile['sample_seconds']:.0f}s de muestra):")
+    for stage, timing in profile['filters'].items():
+        print(f"   {stage:<9} CPU {timing['utime']:7.2f}s | real {timing['rtime']:7.2f}s")
+    for name, timing in profile['codecs'].items():
+        print(f"   {name:<20} CPU {timing['user']:7.2f}s | real {timing['real']:7.2f}s")
+    if profile['title_benchmark']:
+        print(f"   Título: drawtext {profile['title_benchmark']['drawtext']:.2f}s CPU -> placa {profile['title_benchmark']['plate']:.2f}s CPU")
+    print(f"   Informe: {report_path}")
+    return report_path
+
+def get_chunk_frames(loop_duration, target_seconds=SEGMENT_CHUNK_SECONDS):
+    """Calcula la longitud de trozo (en frames): múltiplo del GOP y, si se puede, del loop de fondo"""
+    target_frames = int(target_seconds * SEGMENT_FPS)
+    gop_chunk_frames = -(-target_frames // SEGMENT_GOP_FRAMES) * SEGMENT_GOP_FRAMES
+
+    # Se prefiere un número entero de loops que caiga (casi) justo en un frame y en un GOP:
+    # así los trozos no necesitan desplazar el fondo. Si no existe, basta con el GOP
+    if loop_duration > 0:
+        loops = max(1, int(gop_chunk_frames / (loop_duration * SEGMENT_FPS)))
+        while loops * loop_duration * SEGMENT_FPS <= 2 * target_frames:
+            frames = loops * loop_duration * SEGMENT_FPS
+            if frames >= target_frames and abs(frames - round(frames)) < 0.01 and round(frames) % SEGMENT_GOP_FRAMES == 0:
+                return round(frames)
+            loops += 1
+
+    return gop_chunk_frames
+
+def plan_segment_chunks(folder_durations, loop_duration):
+    """Parte las secciones largas en trozos iguales para repartir mejor el render en paralelo
+
+    Devuelve (carpeta, duración, desplazamiento del fondo) por trozo. Cada trozo empieza el
+    loop de fondo en el punto exacto en el que terminó el anterior, y con su propio keyframe,
+    así que el concat con -c copy los une sin recodificar y sin saltos en el fondo.
+    """
+    chunk_frames = get_chunk_frames(loop_duration)
+    chunk_duration = chunk_frames / SEGMENT_FPS
+
+    plan = []
+    for folder_name, duration in folder_durations:
+        remaining = duration
+        chunk_index = 0
+        # Un resto de menos de un segundo se queda en el último trozo en lugar de ir aparte
+        while True:
+            # Inicio exacto en frames, para que el desplazamiento no acumule errores
+            start = chunk_index * chunk_frames / SEGMENT_FPS
+            offset = start % loop_duration if loop_duration > 0 else 0
+            # Un desplazamiento de menos de medio frame es el inicio del loop
+            if offset < 0.5 / SEGMENT_FPS or loop_duration - offset < 0.5 / SEGMENT_FPS:
+                offset = 0
+            if remaining <= chunk_duration + 1:
+                plan.append((folder_name, remaining, offset))
+                break
+            plan.append((folder_name, chunk_duration, offset))
+            remaining -= chunk_duration
+            chunk_index += 1
+
+    if len(plan) > len(folder_durations):
+        print(f"✂️ {len(folder_durations)} secciones divididas en {len(plan)} trozos de hasta {format_time(chunk_duration)}")
+
+    return plan
+
+def create_video_segments_parallel(job, segment_plan):
     """Crea segmentos de video en paralelo usando multiprocessing"""
     print("Creando segmentos de video en paralelo...")
 
     # Preparar datos para procesamiento paralelo
-    segment_data = [(i, folder_name, duration) for i, (folder_name, duration) in enumerate(folder_durations)]
+    parent_dir = os.path.dirname(job['root_dir'])
+    segment_data = [
+        (i, os.path.join(job['root_dir'], folder_name), duration, background_offset, job['background_path'], job['border_path'], parent_dir)
+        for i, (folder_name, duration, background_offset) in enumerate(segment_plan)
+    ]
+
+    # Cada segmento sólo arranca cuando su ffmpeg cabe en la memoria; el disco ya lo reservó el trabajo
+    ticket = job['resources']
+    video_segments = [None] * len(segment_data)
+
+    def on_segment_done(index, charged, result):
+        video_segments[index] = result
+        RESOURCE_BUDGET.release(ticket, charged)
+
+    def on_segment_error(index, charged, error):
+        print(f"Error creando segmento {index+1}: {error!r}")
+        RESOURCE_BUDGET.release(ticket, charged)
 
     # Usar multiprocessing para crear segmentos en paralelo
-    with Pool(processes=4) as pool:  # Ajustar según tu CPU
-        video_segments = pool.map(create_single_segment, segment_data)
+    with Pool(processes=MAX_PARALLEL_SEGMENTS) as pool:
+        for data in segment_data:
+            i, duration = data[0], data[2]
+            memory, _ = estimate_ffmpeg_footprint(SEGMENT_WIDTH, SEGMENT_HEIGHT, SEGMENT_PRESET, duration)
+            charged = RESOURCE_BUDGET.acquire(ticket, memory, f"Segmento {i+1}")
+
+            pool.apply_async(
+                create_single_segment, (data,),
+                callback=partial(on_segment_done, i, charged),
+                error_callback=partial(on_segment_error, i, charged)
+            )
+
+        pool.close()
+        pool.join()
 
     # Filtrar segmentos exitosos
     successful_segments = [seg for seg in video_segments if seg is not None]
 
-    if len(successful_segments) != len(folder_durations):
-        print(f"Error: Solo se crearon {len(successful_segments)} de {len(folder_durations)} segmentos")
+    if len(successful_segments) != len(segment_plan):
+        print(f"Error: Solo se crearon {len(successful_segments)} de {len(segment_plan)} segmentos")
         return None
 
     return successful_segments
 
-def create_video_with_audio(audio_duration, folder_durations, intro_path=None, intro_duration=0):
+def hash_file(path):
+    """SHA-1 del contenido de un archivo, leído por bloques"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SegmentCoordinator:
+    """Cola de segmentos pendientes que se reparten a workers remotos por HTTP"""
+
+    def __init__(self, segment_plan, job):
+        self.output_dir = os.path.dirname(job['root_dir'])
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.assets = {}  # asset_id -> ruta local que se sirve a los workers
+        self.tasks = {}
+        self.pending = []
+        self.leases = {}  # índice -> (id de la asignación, instante en que caduca)
+        self.attempts = {}  # índice -> veces que se ha asignado (también es el id de la asignación)
+        self.segments = {}
+        self.failed = None  # Segmento que agotó sus intentos
+        self.last_progress = time.time()
+
+        background_id = self._register_asset(job['background_path'])
+        border_id = self._register_asset(job['border_path'])
+        # Los recursos por defecto se repiten entre trabajos: los workers los mantienen en caché
+        self.cached_assets = [
+            asset_id for asset_id, path in ((background_id, job['background_path']), (border_id, job['border_path']))
+            if path in (DEFAULT_BACKGROUND_PATH, DEFAULT_BORDER_PATH)
+        ]
+
+        for i, (folder_name, duration, background_offset) in enumerate(segment_plan):
+            image_file, title = read_segment_assets(os.path.join(job['root_dir'], folder_name))
+            if not image_file:
+                print(f"Error: La carpeta {folder_name} no tiene imagen")
+                continue
+
+            self.tasks[i] = {
+                'index': i,
+                'duration': duration,
+                'background_offset': background_offset,
+                'title': title,
+                'background': background_id,
+                'border': border_id,
+                'image': self._register_asset(image_file),
+                'cached_assets': self.cached_assets,
+            }
+            self.pending.append(i)
+
+        self.total = len(segment_plan)
+        if not self.pending:
+            self.finished.set()
+
+    def _register_asset(self, path):
+        # El id es el hash del contenido: un archivo cambiado nunca reutiliza una copia obsoleta
+        asset_id = f"{hash_file(path)}{os.path.splitext(path)[1].lower()}"
+        self.assets[asset_id] = path
+        return asset_id
+
+    def _requeue(self, i):
+        # Llamar con el lock tomado. Un segmento que falla siempre hace fallar el trabajo
+        del self.leases[i]
+        if self.attempts[i] >= SEGMENT_MAX_ATTEMPTS:
+            print(f"❌ Segmento {i+1} falló {self.attempts[i]} veces, se cancela el trabajo")
+            self.failed = i
+            self.finished.set()
+        else:
+            self.pending.append(i)
+
+    def expire_leases(self):
+        """Devuelve a la cola las asignaciones caducadas (worker caído)"""
+        with self.lock:
+            now = time.time()
+            for i, (_, expires) in list(self.leases.items()):
+                if expires < now:
+                    print(f"⚠️ Segmento {i+1} sin respuesta del worker, se reasigna")
+                    self._requeue(i)
+
+    def next_task(self):
+        """Asigna el siguiente segmento. Devuelve None si no queda nada que repartir"""
+        self.expire_leases()
+        with self.lock:
+            if not self.pending or self.finished.is_set():
+                return None
+
+            i = self.pending.pop(0)
+            now = time.time()
+            self.attempts[i] = self.attempts.get(i, 0) + 1
+            self.leases[i] = (self.attempts[i], now + self.tasks[i]['duration'] + SEGMENT_LEASE_MARGIN)
+            self.last_progress = now
+            return dict(self.tasks[i], lease=self.attempts[i])
+
+    def fail_task(self, i, lease):
+        """Devuelve a la cola un segmento que el worker no pudo renderizar
+
+        Sólo cuenta si lease es la asignación vigente: el aviso tardío de un worker cuya
+        asignación ya caducó no debe quitarle el segmento al worker que lo tiene ahora.
+        """
+        with self.lock:
+            if i in self.leases and self.leases[i][0] == lease:
+                self._requeue(i)
+
+    def is_idle(self):
+        """True si hace demasiado que ningún worker pide ni entrega segmentos"""
+        with self.lock:
+            return not self.leases and time.time() - self.last_progress > COORDINATOR_IDLE_TIMEOUT
+
+    def complete_task(self, i, segment_path):
+        """Registra un segmento subido por un worker"""
+        with self.lock:
+            self.leases.pop(i, None)
+            if i in self.pending:
+                self.pending.remove(i)
+            self.segments[i] = segment_path
+            self.last_progress = time.time()
+            print(f"✓ Segmento {i+1} recibido ({len(self.segments)}/{len(self.tasks)})")
+            if len(self.segments) == len(self.tasks):
+                self.finished.set()
+
+    def is_finished(self):
+        return self.finished.is_set()
+
+def make_coordinator_handler(coordinator, token):
+    """Crea el handler HTTP que expone la cola de segmentos del coordinador
+
+    Todas las rutas van bajo /<token>/, así sólo los workers lanzados con la URL del trabajo
+    pueden pedir recursos o subir segmentos.
+    """
+
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # Sin log por petición: el progreso ya se imprime al recibir segmentos
+
+        def _send(self, status, body=b'', content_type='application/json'):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            """Comprueba el token y devuelve el resto de la ruta, o None si no es válido"""
+            parts = self.path.strip('/').split('/')
+            if not hmac.compare_digest(parts[0].encode('utf-8'), token.encode('utf-8')):
+                self._send(403)
+                return None
+            return parts[1:]
+
+        def do_GET(self):
+            parts = self._route()
+            if parts is None:
+                return
+
+            if parts == ['task']:
+                if coordinator.is_finished():
+                    self._send(410)  # Trabajo terminado: el worker puede salir
+                    return
+                task = coordinator.next_task()
+                if task is None:
+                    self._send(204)  # Todo asignado, puede que se reasigne algo más tarde
+                else:
+                    self._send(200, json.dumps(task).encode('utf-8'))
+                return
+
+            if len(parts) == 2 and parts[0] == 'asset' and parts[1] in coordinator.assets:
+                path = coordinator.assets[parts[1]]
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(os.path.getsize(path)))
+                self.end_headers()
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, self.wfile)
+                return
+
+            self._send(404)
+
+        def do_PUT(self):
+            parts = self._route()
+            if parts is None:
+                return
+            if (len(parts) != 3 or parts[0] != 'segment' or not parts[1].isdigit() or not parts[2].isdigit()
+                    or int(parts[1]) not in coordinator.tasks):
+                self._send(404)
+                return
+
+            i, lease = int(parts[1]), int(parts[2])
+            remaining = int(self.headers.get('Content-Length', 0))
+            segment_output = os.path.join(coordinator.output_dir, f"segment_{i:02d}.mp4")
+            partial_output = f"{segment_output}.{threading.get_ident()}.part"
+
+            with open(partial_output, 'wb') as f:
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+
+            if remaining > 0:
+                os.remove(partial_output)
+                coordinator.fail_task(i, lease)
+                self._send(400)
+                return
+
+            os.replace(partial_output, segment_output)
+            coordinator.complete_task(i, segment_output)
+            self._send(200)
+
+        def do_POST(self):
+            parts = self._route()
+            if parts is None:
+                return
+            if len(parts) == 3 and parts[0] == 'fail' and parts[1].isdigit() and parts[2].isdigit():
+                coordinator.fail_task(int(parts[1]), int(parts[2]))
+                self._send(200)
+                return
+            self._send(404)
+
+    return CoordinatorHandler
+
+def create_video_segments_distributed(job, segment_plan):
+    """Reparte los segmentos entre workers remotos y espera a recibirlos todos"""
+    port = job['coordinator_port']
+    token = job['coordinator_token'] or secrets.token_urlsafe(16)
+    coordinator = SegmentCoordinator(segment_plan, job)
+
+    server = ThreadingHTTPServer((job['coordinator_host'], port), make_coordinator_handler(coordinator, token))
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    print(f"🛰️ Coordinador escuchando en {job['coordinator_host']}:{port}: {len(coordinator.tasks)} segmentos para los workers")
+    print(f"   Lanzar workers con: python3 main.py --worker=http://HOST:{port}/{token}")
+
+    # Esperar a los segmentos, revisando asignaciones caducadas aunque ningún worker pregunte
+    while not coordinator.finished.wait(WORKER_POLL_INTERVAL):
+        coordinator.expire_leases()
+        if coordinator.is_idle():
+            print(f"❌ Ningún worker ha trabajado en {format_time(COORDINATOR_IDLE_TIMEOUT)}, se cancela el trabajo")
+            break
+
+    # Dar tiempo a los workers en espera para recibir el fin del trabajo
+    time.sleep(WORKER_POLL_INTERVAL + 1)
+    server.shutdown()
+    server.server_close()
+
+    successful_segments = [coordinator.segments[i] for i in sorted(coordinator.segments)]
+    if len(successful_segments) != coordinator.total:
+        print(f"Error: Solo se crearon {len(successful_segments)} de {coordinator.total} segmentos")
+        return None
+
+    return successful_segments
+
+def fetch_worker_asset(coordinator_url, asset_id, work_dir):
+    """Descarga un recurso del coordinador, reutilizando la copia en caché si ya existe"""
+    asset_path = os.path.join(work_dir, asset_id)
+    if not os.path.exists(asset_path):
+        # Temporal único: varios workers pueden compartir el directorio de caché
+        fd, partial_path = tempfile.mkstemp(dir=work_dir, prefix=f"{asset_id}.", suffix='.part')
+        os.close(fd)
+        try:
+            urllib.request.urlretrieve(f"{coordinator_url}/asset/{asset_id}", partial_path)
+            os.replace(partial_path, asset_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+    return asset_path
+
+def run_worker(coordinator_url, work_dir=None):
+    """Pide segmentos al coordinador, los renderiza y los sube hasta que no quede trabajo"""
+    coordinator_url = coordinator_url.rstrip('/')
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), "sleepai_worker")
+    os.makedirs(work_dir, exist_ok=True)
+
+    print(f"🛠️ Worker conectado a {coordinator_url} (caché en {work_dir})")
+    rendered = 0
+    job_assets = set()  # Recursos descargados para este trabajo
+    cached_assets = set()  # Los que se quedan en caché para los trabajos siguientes
+    last_contact = time.time()
+
+    while True:
+        try:
+            with urllib.request.urlopen(f"{coordinator_url}/task") as response:
+                last_contact = time.time()
+                if response.status == 204:
+                    time.sleep(WORKER_POLL_INTERVAL)
+                    continue
+                task = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            if e.code == 410:
+                break
+            if e.code == 403:
+                print("❌ El coordinador rechazó el token de la URL del worker")
+                break
+            if time.time() - last_contact > WORKER_CONNECT_TIMEOUT:
+                break
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+        except (urllib.error.URLError, ConnectionError):
+            # Coordinador todavía no arrancado o ya cerrado
+            if time.time() - last_contact > WORKER_CONNECT_TIMEOUT:
+                break
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+
+        i = task['index']
+        job_assets.update((task['background'], task['border'], task['image']))
+        cached_assets.update(task['cached_assets'])
+        segment_output = os.path.join(work_dir, f"segment_{i:02d}.{os.getpid()}.mp4")
+
+        try:
+            background_path = fetch_worker_asset(coordinator_url, task['background'], work_dir)
+            frame_path = fetch_worker_asset(coordinator_url, task['border'], work_dir)
+            image_file = fetch_worker_asset(coordinator_url, task['image'], work_dir)
+
+            if not render_segment(i, image_file, task['title'], task['duration'], background_path, frame_path,
+                                  segment_output, task['background_offset']):
+                raise RuntimeError("ffmpeg falló")
+
+            with open(segment_output, 'rb') as f:
+                request = urllib.request.Request(
+                    f"{coordinator_url}/segment/{i}/{task['lease']}", data=f, method='PUT',
+                    headers={'Content-Length': str(os.path.getsize(segment_output))}
+                )
+                urllib.request.urlopen(request).close()
+            rendered += 1
+
+        except Exception as e:
+            print(f"Error en el segmento {i+1}: {e}")
+            try:
+                urllib.request.urlopen(urllib.request.Request(f"{coordinator_url}/fail/{i}/{task['lease']}", data=b'', method='POST')).close()
+            except Exception:
+                pass
+
+        finally:
+            if os.path.exists(segment_output):
+                os.remove(segment_output)
+
+    # Con el trabajo terminado sólo se conservan los recursos por defecto: el resto (imágenes,
+    # fondos y borders descargados) no se volverá a pedir y la caché crecería sin límite
+    for asset_id in job_assets - cached_assets:
+        try:
+            os.remove(os.path.join(work_dir, asset_id))
+        except FileNotFoundError:
+            pass  # Otro worker con la misma caché ya lo borró
+
+    print(f"✅ Worker terminado: {rendered} segmentos renderizados")
+    return rendered
+
+def get_video_frame_count(file_path):
+    """Obtiene el número de frames de video que declara la cabecera del MP4 usando ffprobe
+
+    stream=nb_frames sale de la tabla de muestras del moov, así que no hay que leer el archivo
+    entero (el video concatenado ocupa varios GB). Devuelve 0 si el contenedor no lo declara.
+    """
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=nb_frames',
+            '-of', 'csv=p=0', file_path
+        ], capture_output=True, text=True)
+
+        if result.returncode == 0:
+            return int(result.stdout.strip())
+        else:
+            return 0
+    except:
+        return 0
+
+def get_audio_sample_rate(file_path):
+    """Obtiene la frecuencia de muestreo del primer stream de audio usando ffprobe"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=sample_rate',
+            '-of', 'csv=p=0', file_path
+        ], capture_output=True, text=True)
+
+        if result.returncode == 0:
+            return int(result.stdout.strip())
+        else:
+            return 0
+    except:
+        return 0
+
+def estimate_moov_size(video_packets, audio_packets):
+    """Estima (con margen) los bytes del átomo moov de un MP4 con un video y un audio
+
+    Con audio y video intercalados el muxer apenas agrupa muestras en chunks, así que se
+    presupuesta el peor caso por muestra: stsz (4), co64 (8), stsc (12), stts (8), más ctts (8)
+    y stss (4) para el video.
+    """
+    sample_bytes = video_packets * (4 + 8 + 12 + 8 + 8 + 4) + audio_packets * (4 + 8 + 12 + 8)
+    return int(sample_bytes * 1.1) + 64 * 1024
+
+def estimate_final_moov_size(video_path, audio_path):
+    """Reserva de moov para el mux final a partir de los frames y paquetes de las entradas"""
+    video_packets = get_video_frame_count(video_path)
+    if video_packets <= 0:
+        video_packets = int(get_video_duration(video_path) * SEGMENT_FPS)
+
+    # El audio se recodifica a AAC: un paquete cada 1024 muestras, a la frecuencia de la entrada
+    sample_rate = get_audio_sample_rate(audio_path) or 48000
+    audio_packets = int(get_mp3_duration(audio_path) * sample_rate / 1024) + 1
+
+    return estimate_moov_size(video_packets, audio_packets)
+
+def final_mux_args(mode, moov_size=None):
+    """Parámetros del muxer MP4 final según el modo de salida"""
+    if mode == 'fragmented':
+        # Un fragmento por keyframe: lo ya escrito es reproducible y subible mientras se genera
+        return ['-movflags', '+frag_keyframe+empty_moov+default_base_moof']
+    if mode == 'faststart':
+        # Reservar el moov al principio evita la segunda pasada (copia completa) de +faststart
+        return ['-moov_size', str(moov_size)]
+    return []
+
+def create_video_with_audio(job, audio_duration, folder_durations, intro_path=None, intro_duration=0):
     """Crea video con imágenes de cada carpeta y lo combina con el audio concatenado"""
     total_duration = audio_duration + intro_duration
     print(f"Creando video final con duración de {format_time(total_duration)}...")
 
     # Variables para archivos temporales
-    parent_dir = os.path.dirname(root_dir)
+    parent_dir = os.path.dirname(job['root_dir'])
     normalized_intro_path = None
 
-    # Paso 1: Crear segmentos de video en paralelo
-    video_segments = create_video_segments_parallel(folder_durations)
+    # Paso 1: Crear segmentos de video en paralelo (en local o repartidos entre workers)
+    segment_plan = plan_segment_chunks(folder_durations, get_video_duration(job['background_path']))
+    if job['coordinator_port']:
+        video_segments = create_video_segments_distributed(job, segment_plan)
+    else:
+        video_segments = create_video_segments_parallel(job, segment_plan)
 
     if not video_segments:
         print("Error: No se pudieron crear los segmentos de video")
         return False
 
+    # Perfilado opcional: basta con una muestra del segmento más largo
+    if job['profile']:
+        longest = max(range(len(segment_plan)), key=lambda n: segment_plan[n][1])
+        folder_name, duration, _ = segment_plan[longest]
+        image_file, title = read_segment_assets(os.path.join(job['root_dir'], folder_name))
+        profile = profile_segment(longest, image_file, title, duration, job['background_path'], job['border_path'])
+        if profile:
+            render_dir = os.path.join(parent_dir, "render")
+            os.makedirs(render_dir, exist_ok=True)
+            write_profile_report(profile, render_dir)
+
     # Paso 2: Normalizar el intro si existe para que tenga los mismos parámetros que los segmentos
 
     if intro_path and os.path.exists(intro_path):
@@ -476,10 +1474,10 @@ def create_video_with_audio(audio_duration, folder_durations, intro_path=None, i
         normalize_result = subprocess.run([
             'ffmpeg', '-threads', '0',
             '-i', intro_path,
-            '-c:v', 'libx264', '-preset', 'ultrafast',
+            '-c:v', 'libx264', '-preset', SEGMENT_PRESET,
             '-pix_fmt', 'yuv420p',
-            '-r', '25',  # Mismo framerate que los segmentos
-            '-s', '1920x1080',  # Misma resolución que los segmentos
+            '-r', str(SEGMENT_FPS),  # Mismo framerate que los segmentos
+            '-s', f'{SEGMENT_WIDTH}x{SEGMENT_HEIGHT}',  # Misma resolución que los segmentos
             '-c:a', 'aac',  # Mantener y normalizar el audio de la intro
             '-y', normalized_intro_path
         ], capture_output=True, text=True)
@@ -552,24 +1550,15 @@ def create_video_with_audio(audio_duration, folder_durations, intro_path=None, i
     concat_audio = os.path.join(parent_dir, "concat_audio.mp3")
 
     try:
-        if os.path.exists(progress_file):
-            os.remove(progress_file)
-
         print("\n" + "="*50)
         print("CREANDO VIDEO FINAL")
         print("="*50)
+        if job['output_mode'] == 'fragmented':
+            print(f"📡 MP4 fragmentado: {final_video} se puede subir mientras se escribe")
 
         # Guardar tiempo de inicio
         start_time = time.time()
 
-        # Iniciar monitoreo de progreso SIMPLE
-        progress_thread = threading.Thread(
-            target=monitor_simple_progress,
-            args=(progress_file, total_duration, "Progreso", start_time)
-        )
-        progress_thread.daemon = True
-        progress_thread.start()
-
         # Si hay intro, necesitamos combinar el audio de manera diferente
         if intro_duration > 0 and normalized_intro_path:
             # Extraer el audio de la intro normalizada
@@ -597,20 +1586,43 @@ def create_video_with_audio(audio_duration, folder_durations, intro_path=None, i
         else:
             audio_to_use = concat_audio
 
-        process = subprocess.Popen([
-            'ffmpeg', '-threads', '0',
-            '-i', video_concatenado,
-            '-i', audio_to_use,
-            '-c:v', 'copy',  # Copy video sin recodificar
-            '-c:a', 'aac',
-            '-map', '0:v',  # Tomar video del primer input
-            '-map', '1:a',  # Tomar audio del segundo input
-            '-progress', progress_file,
-            '-y',
-            final_video
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        output_mode = job['output_mode']
+        moov_size = estimate_final_moov_size(video_concatenado, audio_to_use) if output_mode == 'faststart' else None
 
-        stdout, stderr = process.communicate()
+        while True:
+            # Archivo y monitor de progreso SIMPLE por intento: el de un intento fallido ya vio progress=end
+            if os.path.exists(progress_file):
+                os.remove(progress_file)
+            progress_thread = threading.Thread(
+                target=monitor_simple_progress,
+                args=(progress_file, total_duration, "Progreso", start_time)
+            )
+            progress_thread.daemon = True
+            progress_thread.start()
+
+            process = subprocess.Popen([
+                'ffmpeg', '-threads', '0',
+                '-i', video_concatenado,
+                '-i', audio_to_use,
+                '-c:v', 'copy',  # Copy video sin recodificar
+                '-c:a', 'aac',
+                '-map', '0:v',  # Tomar video del primer input
+                '-map', '1:a',  # Tomar audio del segundo input
+                *final_mux_args(output_mode, moov_size),
+                '-progress', progress_file,
+                '-y',
+                final_video
+            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+            stdout, stderr = process.communicate()
+            progress_thread.join(timeout=1)
+
+            # Si la reserva del moov se quedó corta, rehacer el mux con el moov al final
+            if process.returncode != 0 and output_mode == 'faststart' and 'reserved_moov_size is too small' in stderr:
+                print(f"\n⚠️ El moov no cabe en los {moov_size} bytes reservados, se repite el mux sin faststart")
+                output_mode = 'default'
+                continue
+            break
 
         # Limpiar archivo de progreso
         if os.path.exists(progress_file):
@@ -639,12 +1651,12 @@ def create_video_with_audio(audio_duration, folder_durations, intro_path=None, i
                 os.remove(normalized_intro_path)
 
             # Limpiar video de fondo descargado si existe
-            if background_url and video_fondo_path != "/home/private/loop.mp4" and os.path.exists(video_fondo_path):
-                os.remove(video_fondo_path)
+            if job['background_url'] and job['background_path'] != DEFAULT_BACKGROUND_PATH and os.path.exists(job['background_path']):
+                os.remove(job['background_path'])
 
             # Limpiar border descargado si existe
-            if border_url and border_path != "/home/private/border.png" and os.path.exists(border_path):
-                os.remove(border_path)
+            if job['border_url'] and job['border_path'] != DEFAULT_BORDER_PATH and os.path.exists(job['border_path']):
+                os.remove(job['border_path'])
 
             # Limpiar archivos temporales de audio si se crearon
             if intro_duration > 0:
@@ -665,31 +1677,30 @@ def create_video_with_audio(audio_duration, folder_durations, intro_path=None, i
         print(f"Error combinando video y audio: {e}")
         return False
 
-def create_audio_list_and_timestamps():
-    global video_fondo_path, border_path
-    
+def create_audio_list_and_timestamps(job):
+    """Genera audios.txt y timestamps.txt, descarga los recursos opcionales y lanza el render"""
     # Rutas - root_dir ya apunta a la carpeta assets
-    assets_path = root_dir
+    assets_path = job['root_dir']
     # Los archivos de salida van en el directorio padre de assets
-    parent_dir = os.path.dirname(root_dir)
+    parent_dir = os.path.dirname(job['root_dir'])
     audio_output = os.path.join(parent_dir, "audios.txt")
     timestamps_output = os.path.join(parent_dir, "timestamps.txt")
 
     # Manejar video de fondo si se proporciona
-    if background_url:
-        downloaded_background = download_background_video(background_url, parent_dir)
+    if job['background_url']:
+        downloaded_background = download_background_video(job['background_url'], parent_dir)
         if downloaded_background:
-            video_fondo_path = downloaded_background
-            print(f"🎬 Video de fondo personalizado descargado: {video_fondo_path}")
+            job['background_path'] = downloaded_background
+            print(f"🎬 Video de fondo personalizado descargado: {job['background_path']}")
         else:
             print("⚠️ No se pudo descargar el video de fondo, usando el predeterminado")
 
     # Manejar border si se proporciona
-    if border_url:
-        downloaded_border = download_border_image(border_url, parent_dir)
+    if job['border_url']:
+        downloaded_border = download_border_image(job['border_url'], parent_dir)
         if downloaded_border:
-            border_path = downloaded_border
-            print(f"🖼️ Border personalizado descargado: {border_path}")
+            job['border_path'] = downloaded_border
+            print(f"🖼️ Border personalizado descargado: {job['border_path']}")
         else:
             print("⚠️ No se pudo descargar el border, usando el predeterminado")
 
@@ -697,8 +1708,8 @@ def create_audio_list_and_timestamps():
     intro_path = None
     intro_duration = 0
 
-    if intro_url:
-        intro_path = download_intro_video(intro_url, parent_dir)
+    if job['intro_url']:
+        intro_path = download_intro_video(job['intro_url'], parent_dir)
         if intro_path:
             intro_duration = get_video_duration(intro_path)
             print(f"📹 Intro descargado con duración: {format_time(intro_duration)}")
@@ -786,27 +1797,180 @@ def create_audio_list_and_timestamps():
     print(f"Archivo {timestamps_output} creado con {len(timestamps)} timestamps")
     print(f"Duración total: {format_time(current_time)}")
 
-    # Concatenar el audio
-    if concatenate_audio():
+    # No empezar a escribir intermedios sin un encoder ni disco reservados para el trabajo completo
+    memory, disk = estimate_job_footprint(current_time + intro_duration)
+    job['resources'] = RESOURCE_BUDGET.admit_job(parent_dir, memory, disk)
+    if not job['resources']:
+        return False
+
+    try:
+        # Concatenar el audio
+        if not concatenate_audio(job):
+            return False
+
         # Crear video final con las imágenes y el audio
         # current_time ahora es solo la duración del audio (sin intro)
-        create_video_with_audio(current_time, folder_durations, intro_path, intro_duration)
+        return create_video_with_audio(job, current_time, folder_durations, intro_path, intro_duration)
+    finally:
+        RESOURCE_BUDGET.finish_job(job['resources'])
+
+def build_job(job_config):
+    """Completa la configuración de un trabajo con los valores por defecto
+
+    Claves aceptadas: root_dir (obligatoria, carpeta assets), video_id, intro/background/border
+    como nombre de archivo en el storage (intro_filename, ...) o URL completa (intro_url, ...),
+    background_path y border_path locales por defecto, coordinator_port, coordinator_host,
+    coordinator_token (si no se da, se genera uno por trabajo), profile y output_mode.
+    """
+    job = {
+        'root_dir': job_config.get('root_dir'),
+        'video_id': job_config.get('video_id'),
+        'intro_url': job_config.get('intro_url'),
+        'background_url': job_config.get('background_url'),
+        'border_url': job_config.get('border_url'),
+        'background_path': job_config.get('background_path') or DEFAULT_BACKGROUND_PATH,
+        'border_path': job_config.get('border_path') or DEFAULT_BORDER_PATH,
+        'coordinator_port': job_config.get('coordinator_port'),
+        'coordinator_host': job_config.get('coordinator_host') or '0.0.0.0',
+        'coordinator_token': job_config.get('coordinator_token'),
+        'profile': bool(job_config.get('profile')),
+        'output_mode': job_config.get('output_mode') or 'default',
+        'resources': None,  # Reserva de RESOURCE_BUDGET mientras el trabajo está en marcha
+    }
+
+    for name, folder in (('intro', 'intros'), ('background', 'backgrounds'), ('border', 'frames')):
+        filename = job_config.get(f'{name}_filename')
+        if filename and not job[f'{name}_url']:
+            job[f'{name}_url'] = f"{STORAGE_BASE_URL}/{folder}/{filename}"
+
+    return job
+
+def render(job_config):
+    """Renderiza un video completo sin efectos globales. Devuelve True si se creó render/render.mp4"""
+    job = build_job(job_config)
+
+    # Verificar que existan los archivos necesarios
+    if not job['root_dir'] or not os.path.exists(job['root_dir']):
+        print(f"❌ No existe el directorio raíz: {job['root_dir']}")
+        return False
 
-if __name__ == "__main__":
-    print(f"🔍 Procesando directorio: {root_dir}")
-    print(f"📹 Video ID: {video_id}")
-    print(f"🎬 Video de fondo: {video_fondo_path}")
-    print(f"🖼️ Border: {border_path}")
-    if intro_url:
-        print(f"🎥 URL Intro: {intro_url}")
+    if not os.path.exists(job['background_path']):
+        print(f"❌ No se encontró el video de fondo en: {job['background_path']}")
+        return False
+
+    if not os.path.exists(job['border_path']):
+        print(f"❌ No se encontró el border en: {job['border_path']}")
+        return False
+
+    if job['output_mode'] not in FINAL_OUTPUT_MODES:
+        print(f"❌ Modo de salida desconocido: {job['output_mode']} (opciones: {', '.join(FINAL_OUTPUT_MODES)})")
+        return False
+
+    print(f"🔍 Procesando directorio: {job['root_dir']}")
+    print(f"📹 Video ID: {job['video_id']}")
+    print(f"🎬 Video de fondo: {job['background_path']}")
+    print(f"🖼️ Border: {job['border_path']}")
+    if job['intro_url']:
+        print(f"🎥 URL Intro: {job['intro_url']}")
     else:
         print("🎥 Sin video intro")
-    if background_url:
-        print(f"🎬 URL Video de fondo: {background_url}")
+    if job['background_url']:
+        print(f"🎬 URL Video de fondo: {job['background_url']}")
     else:
         print("🎬 Usando video de fondo predeterminado")
-    if border_url:
-        print(f"🖼️ URL Border: {border_url}")
+    if job['border_url']:
+        print(f"🖼️ URL Border: {job['border_url']}")
     else:
         print("🖼️ Usando border predeterminado")
-    create_audio_list_and_timestamps()
\ No newline at end of file
+
+    return bool(create_audio_list_and_timestamps(job))
+
+def parse_cli_args(argv):
+    """Separa opciones (--clave=valor) de los argumentos posicionales de la línea de comandos"""
+    options = {}
+    args = []
+    for arg in argv:
+        if arg.startswith('--'):
+            key, _, value = arg[2:].partition('=')
+            options[key] = value
+        else:
+            args.append(arg)
+    return options, args
+
+# Opciones admitidas en la línea de comandos y si llevan valor (--clave=valor) o no (--clave)
+CLI_OPTIONS = {
+    'worker': True,
+    'workdir': True,
+    'coordinator': True,
+    'coordinator-host': True,
+    'coordinator-token': True,
+    'profile': False,
+    'output-mode': True,
+}
+
+def print_usage():
+    """Muestra cómo invocar main.py"""
+    print("Uso: python3 main.py /ruta/del/directorio VIDEO_ID [INTRO_FILENAME_OPCIONAL] [BACKGROUND_FILENAME_OPCIONAL] [BORDER_FILENAME_OPCIONAL] [--coordinator=PUERTO [--coordinator-host=IP] [--coordinator-token=TOKEN]] [--profile] [--output-mode=default|fragmented|faststart]")
+    print("     python3 main.py --worker=http://COORDINADOR:PUERTO/TOKEN [--workdir=/ruta/cache]")
+
+def validate_cli_options(options):
+    """Comprueba las opciones de la línea de comandos. Devuelve un mensaje de error o None"""
+    for key, value in options.items():
+        if key not in CLI_OPTIONS:
+            return f"Opción desconocida: --{key}"
+        if CLI_OPTIONS[key] and not value:
+            return f"La opción --{key} necesita un valor (--{key}=...)"
+        if not CLI_OPTIONS[key] and value:
+            return f"La opción --{key} no admite valor"
+
+    if 'coordinator' in options:
+        if not options['coordinator'].isdigit() or not 0 < int(options['coordinator']) < 65536:
+            return f"Puerto de coordinador no válido: {options['coordinator']}"
+
+    if 'output-mode' in options and options['output-mode'] not in FINAL_OUTPUT_MODES:
+        return f"Modo de salida desconocido: {options['output-mode']} (opciones: {', '.join(FINAL_OUTPUT_MODES)})"
+
+    return None
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos. Devuelve el código de salida"""
+    options, args = parse_cli_args(sys.argv[1:] if argv is None else argv)
+
+    error = validate_cli_options(options)
+    if error:
+        print(f"❌ {error}")
+        print_usage()
+        return 1
+
+    # Modo worker: renderiza segmentos para un coordinador remoto (--worker=http://host:puerto/token)
+    if 'worker' in options:
+        run_worker(options['worker'], options.get('workdir'))
+        return 0
+
+    # Verificar argumentos de línea de comandos
+    if len(args) < 2:
+        print("❌ Debes proporcionar la ruta del directorio raíz y el video_id como argumentos.")
+        print_usage()
+        return 1
+
+    job_config = {
+        'root_dir': args[0],
+        'video_id': args[1],
+        # Modo coordinador: reparte los segmentos entre workers (--coordinator=puerto)
+        'coordinator_port': int(options['coordinator']) if 'coordinator' in options else None,
+        'coordinator_host': options.get('coordinator-host'),
+        'coordinator_token': options.get('coordinator-token'),
+        # Perfilado opcional de una muestra de segmento (--profile)
+        'profile': 'profile' in options,
+        # Modo de escritura del MP4 final (--output-mode=default|fragmented|faststart)
+        'output_mode': options.get('output-mode') or 'default',
+    }
+    # Intro, video de fondo y border opcionales, como nombre de archivo del storage
+    for position, name in ((2, 'intro'), (3, 'background'), (4, 'border')):
+        if len(args) > position:
+            job_config[f'{name}_filename'] = args[position]
+
+    return 0 if render(job_config) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
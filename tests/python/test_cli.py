@@ -0,0 +1,41 @@
+"""Validación de la línea de comandos de main.py"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import main  # noqa: E402
+
+
+@pytest.mark.parametrize('argv', [
+    ['/tmp/assets', 'ID', '--coordinator=abc'],
+    ['/tmp/assets', 'ID', '--coordinator=70000'],
+    ['/tmp/assets', 'ID', '--coordinator'],
+    ['/tmp/assets', 'ID', '--output-mode=mkv'],
+    ['/tmp/assets', 'ID', '--profile=yes'],
+    ['/tmp/assets', 'ID', '--unknown'],
+    ['--worker'],
+    ['/tmp/assets'],
+])
+def test_invalid_arguments_print_usage(argv, capsys):
+    assert main.main(argv) == 1
+    assert 'Uso: python3 main.py' in capsys.readouterr().out
+
+
+def test_valid_options_reach_render(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(main, 'render', lambda job_config: jobs.append(job_config) or True)
+
+    assert main.main(['/tmp/assets', 'ID', 'intro.mp4', '--coordinator=8765', '--profile', '--output-mode=fragmented']) == 0
+    assert jobs == [{
+        'root_dir': '/tmp/assets',
+        'video_id': 'ID',
+        'coordinator_port': 8765,
+        'coordinator_host': None,
+        'coordinator_token': None,
+        'profile': True,
+        'output_mode': 'fragmented',
+        'intro_filename': 'intro.mp4',
+    }]
@@ -0,0 +1,167 @@
+"""Render distribuido con varios workers en localhost, usando un ffmpeg falso"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+import main  # noqa: E402
+
+# Escribe el archivo de salida (último argumento, salvo "-") y falla con "-t 7" para simular un segmento roto
+FAKE_FFMPEG = """#!/bin/sh
+prev=""
+for arg; do
+    if [ "$prev" = "-t" ] && [ "$arg" = "7" ]; then
+        exit 1
+    fi
+    prev="$arg"
+done
+if [ "$prev" != "-" ]; then
+    echo "video $prev" > "$prev"
+fi
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ffmpeg = bin_dir / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(main, 'TITLE_PLATE_DIR', str(tmp_path / "plates"))
+
+    assets = tmp_path / "job" / "assets"
+    for n in range(6):
+        folder = assets / f"{n:02d}"
+        folder.mkdir(parents=True)
+        (folder / "image.png").write_bytes(b"png")
+        (folder / "title.txt").write_text(f"Sección {n}", encoding='utf-8')
+
+    (tmp_path / "loop.mp4").write_bytes(b"loop" * 1000)
+    (tmp_path / "border.png").write_bytes(b"border")
+
+    return main.build_job({
+        'root_dir': str(assets),
+        'background_path': str(tmp_path / "loop.mp4"),
+        'border_path': str(tmp_path / "border.png"),
+        'coordinator_port': free_port(),
+        'coordinator_host': '127.0.0.1',
+        'coordinator_token': 'secreto',
+    })
+
+
+def start_workers(job, work_dir, count=3):
+    url = f"http://127.0.0.1:{job['coordinator_port']}/{job['coordinator_token']}"
+    return [
+        subprocess.Popen(
+            [sys.executable, os.path.join(REPO_DIR, 'main.py'), f'--worker={url}', f'--workdir={work_dir}'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        for _ in range(count)
+    ]
+
+
+def test_workers_render_all_segments(job, tmp_path):
+    # Los tres workers comparten el directorio de caché a propósito
+    workers = start_workers(job, tmp_path / "cache")
+    plan = [(f"{n:02d}", 5, 0) for n in range(6)]
+
+    segments = main.create_video_segments_distributed(job, plan)
+
+    for worker in workers:
+        assert worker.wait(timeout=30) == 0
+    assert segments == [os.path.join(os.path.dirname(job['root_dir']), f"segment_{n:02d}.mp4") for n in range(6)]
+    assert all(os.path.getsize(segment) > 0 for segment in segments)
+    # Fondo y border no son los de por defecto: no se quedan en la caché de los workers
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_failing_segment_fails_the_job(job, tmp_path):
+    workers = start_workers(job, tmp_path / "cache")
+    plan = [(f"{n:02d}", 7 if n == 3 else 5, 0) for n in range(6)]
+
+    started = time.time()
+    assert main.create_video_segments_distributed(job, plan) is None
+    assert time.time() - started < 60
+
+    for worker in workers:
+        worker.wait(timeout=30)
+
+
+def test_coordinator_gives_up_without_workers(job, monkeypatch):
+    monkeypatch.setattr(main, 'COORDINATOR_IDLE_TIMEOUT', 1)
+    monkeypatch.setattr(main, 'WORKER_POLL_INTERVAL', 0.2)
+
+    assert main.create_video_segments_distributed(job, [("00", 5, 0)]) is None
+
+
+def test_coordinator_rejects_wrong_token(job):
+    coordinator = main.SegmentCoordinator([("00", 5, 0)], job)
+    server = main.ThreadingHTTPServer(('127.0.0.1', job['coordinator_port']), main.make_coordinator_handler(coordinator, 'secreto'))
+    thread = main.threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{job['coordinator_port']}/otro/task")
+        assert error.value.code == 403
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_assets_are_keyed_by_content(job):
+    coordinator = main.SegmentCoordinator([(f"{n:02d}", 5, 0) for n in range(6)], job)
+
+    # Las seis imágenes tienen el mismo contenido, así que son un único recurso
+    assert len({task['image'] for task in coordinator.tasks.values()}) == 1
+    assert coordinator.tasks[0]['background'].startswith(main.hash_file(job['background_path']))
+    assert coordinator.cached_assets == []
+
+
+def test_late_failure_from_expired_lease_is_ignored(job, monkeypatch):
+    coordinator = main.SegmentCoordinator([("00", 5, 0)], job)
+    server = main.ThreadingHTTPServer(('127.0.0.1', job['coordinator_port']), main.make_coordinator_handler(coordinator, 'secreto'))
+    thread = main.threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        # La asignación del worker A caduca y el segmento pasa al worker B
+        monkeypatch.setattr(main, 'SEGMENT_LEASE_MARGIN', -60)
+        task_a = coordinator.next_task()
+        monkeypatch.setattr(main, 'SEGMENT_LEASE_MARGIN', 600)
+        task_b = coordinator.next_task()
+        assert task_b['index'] == task_a['index'] and task_b['lease'] != task_a['lease']
+
+        # A avisa tarde de su fallo, dos veces: no debe tocar la asignación de B
+        for _ in range(2):
+            urllib.request.urlopen(urllib.request.Request(
+                f"http://127.0.0.1:{job['coordinator_port']}/secreto/fail/0/{task_a['lease']}", data=b'', method='POST'
+            )).close()
+
+        assert coordinator.leases[0][0] == task_b['lease']
+        assert coordinator.attempts[0] == 2
+        assert not coordinator.is_finished()
+
+        body = b"video"
+        urllib.request.urlopen(urllib.request.Request(
+            f"http://127.0.0.1:{job['coordinator_port']}/secreto/segment/0/{task_b['lease']}", data=body, method='PUT',
+            headers={'Content-Length': str(len(body))}
+        )).close()
+        assert coordinator.is_finished() and coordinator.failed is None
+    finally:
+        server.shutdown()
+        server.server_close()
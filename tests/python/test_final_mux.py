@@ -0,0 +1,70 @@
+"""Modos de salida del mux final y reserva del moov para faststart"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import main  # noqa: E402
+
+# Responde como ffprobe con lo que haya en $FRAMES; falla si se le pide leer todos los paquetes
+FAKE_FFPROBE = """#!/bin/sh
+case "$*" in
+    *-count_packets*) exit 1 ;;
+esac
+echo "$FRAMES"
+"""
+
+
+def test_default_mode_keeps_muxer_defaults():
+    assert main.final_mux_args('default') == []
+
+
+def test_fragmented_mode_writes_fragments_from_the_start():
+    args = main.final_mux_args('fragmented')
+
+    assert args[0] == '-movflags'
+    assert {'frag_keyframe', 'empty_moov'} <= set(args[1].lstrip('+').split('+'))
+
+
+def test_faststart_mode_reserves_the_moov():
+    assert main.final_mux_args('faststart', 123456) == ['-moov_size', '123456']
+
+
+def test_moov_estimate_covers_every_sample():
+    # 3 h a 25 fps y AAC a 48 kHz
+    video_packets, audio_packets = 3 * 3600 * 25, 3 * 3600 * 48000 // 1024
+    moov = main.estimate_moov_size(video_packets, audio_packets)
+
+    # Como mínimo stsz + co64 + stts por muestra, aunque el muxer no agrupe nada en chunks
+    assert moov > (video_packets + audio_packets) * (4 + 8 + 8)
+    assert main.estimate_moov_size(2 * video_packets, audio_packets) > moov
+    assert main.estimate_moov_size(0, 0) > 0
+
+
+@pytest.fixture
+def fake_ffprobe(tmp_path, monkeypatch):
+    ffprobe = tmp_path / "ffprobe"
+    ffprobe.write_text(FAKE_FFPROBE)
+    ffprobe.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return monkeypatch
+
+
+def test_frame_count_comes_from_the_header(fake_ffprobe):
+    fake_ffprobe.setenv('FRAMES', '270000')
+
+    assert main.get_video_frame_count("video_concatenado.mp4") == 270000
+
+
+def test_final_moov_falls_back_to_duration(fake_ffprobe):
+    fake_ffprobe.setenv('FRAMES', 'N/A')
+    fake_ffprobe.setattr(main, 'get_video_duration', lambda path: 3600.0)
+    fake_ffprobe.setattr(main, 'get_mp3_duration', lambda path: 3600.0)
+    fake_ffprobe.setattr(main, 'get_audio_sample_rate', lambda path: 44100)
+
+    assert main.get_video_frame_count("video_concatenado.mp4") == 0
+    assert main.estimate_final_moov_size("video.mp4", "audio.mp3") == main.estimate_moov_size(
+        3600 * main.SEGMENT_FPS, int(3600 * 44100 / 1024) + 1
+    )
@@ -0,0 +1,95 @@
+"""Lectura de la salida de ffmpeg -benchmark/-benchmark_all/-stats"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import main  # noqa: E402
+
+# Capturado de ffmpeg 7.0 (libx264, salida null); -stats se reescribe con \r
+FFMPEG_7_STDERR = (
+    "Press [q] to stop, [?] for help\n"
+    "bench:        3 user        0 sys        4 real decode_video 0:0 \n"
+    "bench:        1 user        0 sys        2 real decode_video 0:0 \n"
+    "bench: 18446744073709550359 user 18446744073709551609 sys 18446744073709550343 real encode_video 0.0 \n"
+    "bench:     1772 user        7 sys     1800 real encode_video 0.0 \n"
+    "frame=    1 fps=0.0 q=18.0 size=N/A time=00:00:00.04 bitrate=N/A speed=1.2x    \r"
+    "bench:      563 user       49 sys      611 real encode_video 0.0 \n"
+    "bench:      556 user        0 sys      561 real flush_video 0.0 \n"
+    "[out#0/null @ 0x1ed29ac0] video:10KiB audio:0KiB subtitle:0KiB other streams:0KiB global headers:0KiB\n"
+    "frame=    5 fps=0.0 q=18.0 Lsize=N/A time=00:00:00.20 bitrate=N/A speed=9.09x    \n"
+    "bench: utime=0.018s stime=0.004s rtime=0.022s\n"
+    "bench: maxrss=23940KiB\n"
+)
+
+# Formato de ffmpeg 4.x: flujos como "0.0" en decode y maxrss en kB
+FFMPEG_4_STDERR = (
+    "bench:       12 user        1 sys       14 real decode_video 0.0\n"
+    "bench:       10 user        0 sys       11 real decode_video 0.0\n"
+    "bench:     2400 user      100 sys     2600 real encode_video 0.0\n"
+    "frame=  750 fps=187 q=-1.0 Lsize=N/A time=00:00:30.00 bitrate=N/A speed=7.48x    \n"
+    "bench: utime=12.500s stime=0.750s rtime=4.010s\n"
+    "bench: maxrss=412304kB\n"
+)
+
+
+def test_parses_ffmpeg_7_benchmark():
+    report = main.parse_ffmpeg_benchmark(FFMPEG_7_STDERR)
+
+    assert (report['utime'], report['stime'], report['rtime']) == (0.018, 0.004, 0.022)
+    assert report['maxrss_kib'] == 23940
+    assert (report['frames'], report['fps'], report['speed']) == (5, 0.0, 9.09)
+
+    assert set(report['codecs']) == {'decode_video 0.0', 'encode_video 0.0', 'flush_video 0.0'}
+    assert report['codecs']['decode_video 0.0']['calls'] == 2
+    # La línea con el delta negativo (uint64) se descarta
+    encode = report['codecs']['encode_video 0.0']
+    assert encode['calls'] == 2
+    assert encode['user'] == pytest.approx((1772 + 563) / 1e6)
+    assert encode['sys'] == pytest.approx((7 + 49) / 1e6)
+
+
+def test_parses_ffmpeg_4_benchmark():
+    report = main.parse_ffmpeg_benchmark(FFMPEG_4_STDERR)
+
+    assert report['utime'] == 12.5
+    assert report['maxrss_kib'] == 412304
+    assert report['speed'] == 7.48
+    assert report['codecs']['decode_video 0.0'] == {
+        'user': pytest.approx(22e-6), 'sys': pytest.approx(1e-6), 'real': pytest.approx(25e-6), 'calls': 2
+    }
+    assert report['codecs']['encode_video 0.0']['real'] == pytest.approx(0.0026)
+
+
+def test_missing_benchmark_output_gives_empty_report():
+    assert main.parse_ffmpeg_benchmark("ffmpeg version 7.0\n") == {'codecs': {}}
+
+
+# Falla si se le pide drawtext (como un ffmpeg sin freetype); si no, imprime un benchmark
+FAKE_FFMPEG = """#!/bin/sh
+case "$*" in
+    *drawtext*) echo "No such filter: 'drawtext'" >&2; exit 1 ;;
+esac
+echo "bench:      500 user       10 sys      520 real encode_video 0.0" >&2
+echo "frame=  750 fps=250 q=-1.0 Lsize=N/A time=00:00:30.00 bitrate=N/A speed=10x" >&2
+echo "bench: utime=3.000s stime=0.100s rtime=3.000s" >&2
+echo "bench: maxrss=200000KiB" >&2
+"""
+
+
+def test_profile_survives_ffmpeg_without_drawtext(tmp_path, monkeypatch):
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(main, 'get_title_plate', lambda title: (str(tmp_path / "placa.png"), 710, 72))
+
+    profile = main.profile_segment(0, "image.png", "Título", 60, "loop.mp4", "border.png")
+
+    assert profile is not None
+    assert profile['title_benchmark'] is None
+    assert set(profile['filters']) == {'scale', 'overlay', 'title', 'encode'}
+    assert profile['codecs']['encode_video 0.0']['calls'] == 1
+    assert profile['stages']['encode']['speed'] == 10.0
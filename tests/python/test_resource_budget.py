@@ -0,0 +1,87 @@
+"""Admisión de trabajos y renders según la memoria y el disco libres"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import main  # noqa: E402
+
+GB = 1024 ** 3
+
+
+@pytest.fixture
+def resources(monkeypatch):
+    free = {'memory': 8 * GB, 'disk': 100 * GB}
+    monkeypatch.setattr(main, 'get_available_memory', lambda: free['memory'])
+    monkeypatch.setattr(main, 'get_free_disk', lambda path: free['disk'])
+    return free
+
+
+@pytest.fixture
+def budget(resources):
+    return main.ResourceBudget(memory_reserve=0, disk_reserve=0)
+
+
+def test_footprint_grows_with_resolution_and_duration():
+    memory, disk = main.estimate_ffmpeg_footprint(1920, 1080, 'ultrafast', 60)
+    small_memory, _ = main.estimate_ffmpeg_footprint(1280, 720, 'ultrafast', 60)
+    _, long_disk = main.estimate_ffmpeg_footprint(1920, 1080, 'ultrafast', 120)
+
+    assert 150 * 1024 ** 2 < memory < 4 * GB
+    assert small_memory < memory
+    assert long_disk == pytest.approx(2 * disk, rel=0.01)
+    assert main.estimate_ffmpeg_footprint(1920, 1080, 'slow', 60)[1] < disk
+
+
+def test_concurrent_jobs_share_the_disk(budget, tmp_path):
+    assert budget.admit_job(str(tmp_path), GB, 60 * GB, timeout=0)
+    # El segundo trabajo no cabe aunque el disco libre (sin cambios) diga 100 GB
+    assert budget.admit_job(str(tmp_path), GB, 60 * GB, timeout=0) is None
+
+
+def test_second_job_waits_for_memory(budget, tmp_path):
+    first = budget.admit_job(str(tmp_path), 6 * GB, GB, timeout=0)
+    assert budget.admit_job(str(tmp_path), 6 * GB, GB, timeout=0) is None
+
+    threading.Timer(0.2, budget.finish_job, (first,)).start()
+    started = time.time()
+    assert budget.admit_job(str(tmp_path), 6 * GB, GB, timeout=5)
+    assert time.time() - started < 5
+
+
+def test_lone_job_is_admitted_without_enough_memory(budget, resources, tmp_path):
+    resources['memory'] = GB
+
+    assert budget.admit_job(str(tmp_path), 4 * GB, GB, timeout=0)
+
+
+def test_finished_job_returns_its_disk(budget, tmp_path):
+    ticket = budget.admit_job(str(tmp_path), GB, 60 * GB, timeout=0)
+    budget.finish_job(ticket)
+
+    assert budget.admit_job(str(tmp_path), GB, 60 * GB, timeout=0)
+
+
+def test_job_renders_serially_when_memory_is_short(budget, tmp_path):
+    ticket = budget.admit_job(str(tmp_path), 6 * GB, GB, timeout=0)
+
+    # El primer render usa el encoder reservado; el segundo necesita 6 GB más y espera
+    assert budget.acquire(ticket, 6 * GB, "Segmento 1") == 0
+    threading.Timer(0.2, budget.release, (ticket, 0)).start()
+    assert budget.acquire(ticket, 6 * GB, "Segmento 2") == 0
+
+
+def test_job_renders_in_parallel_with_spare_memory(budget, tmp_path):
+    ticket = budget.admit_job(str(tmp_path), GB, GB, timeout=0)
+
+    assert budget.acquire(ticket, GB, "Segmento 1") == 0
+    assert budget.acquire(ticket, GB, "Segmento 2") == GB
+    budget.release(ticket, GB)
+    budget.release(ticket, 0)
+    budget.finish_job(ticket)
+
+    assert budget.memory_in_use == 0
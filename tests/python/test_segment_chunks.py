@@ -0,0 +1,34 @@
+"""Planificación de trozos de secciones largas"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import main  # noqa: E402
+
+
+@pytest.mark.parametrize('loop_duration', [8.0, 100 / 24, 7.3, 7.37, 0])
+def test_background_is_continuous_across_chunks(loop_duration):
+    plan = main.plan_segment_chunks([('a', 3 * 3600 + 0.5)], loop_duration)
+
+    assert sum(duration for _, duration, _ in plan) == pytest.approx(3 * 3600 + 0.5)
+    for (_, duration, offset), (_, _, next_offset) in zip(plan, plan[1:]):
+        assert duration * main.SEGMENT_FPS % main.SEGMENT_GOP_FRAMES == pytest.approx(0)
+        if loop_duration:
+            # El siguiente trozo arranca el fondo donde terminó el anterior (±medio frame)
+            gap = (offset + duration - next_offset) % loop_duration
+            assert min(gap, loop_duration - gap) < 0.5 / main.SEGMENT_FPS
+
+
+def test_exact_loop_lengths_need_no_offset():
+    plan = main.plan_segment_chunks([('a', 3600)], 100 / 24)
+
+    assert all(offset == 0 for _, _, offset in plan)
+
+
+def test_short_sections_are_not_split():
+    plan = main.plan_segment_chunks([('a', 120), ('b', 601)], 8.0)
+
+    assert plan == [('a', 120, 0), ('b', 601, 0)]
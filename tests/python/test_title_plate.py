@@ -0,0 +1,107 @@
+"""Placa del título: alto según las líneas y recorte a la caja del texto"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import main  # noqa: E402
+
+# Imita la salida de cropdetect: los primeros frames sin detección y luego la caja real
+FAKE_FFMPEG = """#!/bin/sh
+echo "[Parsed_cropdetect_1] x1:1919 x2:0 y1:187 y2:0 w:-1904 h:-176 x:1912 y:184" >&2
+echo "[Parsed_cropdetect_1] x1:711 x2:1207 y1:73 y2:153 w:496 h:80 x:712 y:74" >&2
+"""
+
+
+def test_plate_grows_with_title_lines():
+    one_line = main.get_title_plate_height("Uno")
+    three_lines = main.get_title_plate_height("Uno\nDos\nTres")
+    line_height = int(main.TITLE_STYLE['fontsize'] * main.TITLE_LINE_HEIGHT)
+
+    assert three_lines - one_line >= 2 * line_height
+    assert three_lines % 2 == 0
+    assert main.get_title_plate_height("\n" * 50) == main.SEGMENT_HEIGHT
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_bounds_cover_the_text_in_even_coordinates(fake_ffmpeg):
+    x, y, w, h = main.detect_plate_bounds("placa.png")
+
+    assert (x, y) == (710, 72)
+    assert x + w >= 1208 and y + h >= 154
+    assert w % 2 == 0 and h % 2 == 0
+
+
+def get_token(text, terms):
+    """Lee un token como av_get_token de ffmpeg: '\\' escapa un carácter y '...' es literal"""
+    token, i, quoted = '', 0, False
+    while i < len(text):
+        char = text[i]
+        if char == '\\' and i + 1 < len(text):
+            token += text[i + 1]
+            i += 2
+            continue
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char in terms:
+            return token, text[i + 1:]
+        else:
+            token += char
+        i += 1
+    return token, ''
+
+
+def parse_filter_options(graph):
+    """Separa un filtergraph de un solo filtro en sus opciones, con los dos niveles de escape"""
+    filter_spec, rest = get_token(graph, '[],;')
+    assert rest == ''
+    name, args = filter_spec.split('=', 1)
+    options = {}
+    while args:
+        option, args = get_token(args, ':')
+        key, value = option.split('=', 1)
+        options[key] = value
+    return name, options
+
+
+TRICKY_TITLE = "It's 50% {hecho}: C:\\ruta\\ %{localtime} [1,2];"
+
+
+def test_drawtext_filter_survives_tricky_paths():
+    text_file = "/tmp/títulos/it's: a\\b [1,2];.txt"
+    name, options = parse_filter_options(main.title_drawtext_filter(text_file))
+
+    assert name == 'drawtext'
+    assert options['textfile'] == text_file
+    assert options['expansion'] == 'none'  # "%{" se dibuja tal cual
+    assert options['fontsize'] == str(main.TITLE_STYLE['fontsize'])
+
+
+def test_title_text_goes_verbatim_to_the_text_file(tmp_path, monkeypatch):
+    written = {}
+    real_filter = main.title_drawtext_filter
+
+    def capture_filter(text_file):
+        with open(text_file, encoding='utf-8') as f:
+            written['title'] = f.read()
+        return real_filter(text_file)
+
+    ffmpeg = tmp_path / "ffmpeg"
+    ffmpeg.write_text("#!/bin/sh\nexit 1\n")
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(main, 'title_drawtext_filter', capture_filter)
+
+    assert main.get_title_plate(TRICKY_TITLE, cache_dir=str(tmp_path / "plates")) is None
+    assert written['title'] == TRICKY_TITLE
+    # El texto nunca pasa por el filtergraph
+    assert 'localtime' not in real_filter(str(tmp_path / "plates" / "t.txt"))